@@ -0,0 +1,98 @@
+"""Wire size and CPU cost of each response encoding for a large /events list.
+
+Builds a synthetic list shaped like EventSerializer output (including the
+attendees id list) and renders it with each available renderer, then runs
+it through each available content coding. CPU time is process time, so it
+is not skewed by whatever else the machine is doing.
+
+Usage:
+    python benchmarks/payloads.py
+    python benchmarks/payloads.py --events 50000 --attendees 12 --repeat 5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'levelup.settings')
+
+import django  # noqa: E402 pylint: disable=wrong-import-position
+
+django.setup()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402 pylint: disable=wrong-import-position
+from levelupapi import compression, renderers  # noqa: E402 pylint: disable=wrong-import-position
+
+
+def build_events(count, attendees):
+    """Fake EventSerializer(many=True).data for `count` events"""
+    rng = random.Random(42)
+    return [
+        {
+            'id': pk,
+            'game': rng.randint(1, 500),
+            'description': f'Come play game night #{pk}',
+            'date': f'2022-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+            'time': f'{rng.randint(0, 23):02d}:{rng.choice((0, 15, 30, 45)):02d}:00',
+            'organizer': rng.randint(1, 5000),
+            'attendees': rng.sample(range(1, 5000), rng.randint(0, attendees * 2)),
+            'joined': rng.random() < 0.1,
+        }
+        for pk in range(1, count + 1)
+    ]
+
+
+def cpu_ms(func, arg, repeat):
+    """Best-of-N process time for func(arg) in milliseconds"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.process_time()
+        result = func(arg)
+        elapsed = time.process_time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=50000)
+    parser.add_argument('--attendees', type=int, default=6,
+                        help='average attendees per event')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data = build_events(args.events, args.attendees)
+
+    encoders = {'json': JSONRenderer().render}
+    if renderers.msgpack is not None:
+        encoders['msgpack'] = renderers.MessagePackRenderer().render
+    else:
+        print('msgpack not installed, skipping MessagePack')
+
+    codings = {'identity': None, **compression.CODECS}
+    missing = {'br', 'zstd'} - set(codings)
+    if missing:
+        print(f"not installed, skipping: {', '.join(sorted(missing))}")
+
+    print(f'{args.events} events, ~{args.attendees} attendees each\n')
+    print(f"{'encoding':<18}{'bytes':>14}{'ratio':>8}{'render ms':>12}{'compress ms':>14}")
+    baseline = None
+    for name, render in encoders.items():
+        body, render_ms = cpu_ms(render, data, args.repeat)
+        for coding, compress in codings.items():
+            if compress is None:
+                encoded, compress_ms = body, 0.0
+            else:
+                encoded, compress_ms = cpu_ms(compress, body, args.repeat)
+            baseline = baseline or len(encoded)
+            print(f"{name + '+' + coding:<18}{len(encoded):>14,}"
+                  f"{len(encoded) / baseline:>8.2f}{render_ms:>12.1f}{compress_ms:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Cold-start benchmark for the levelup settings profiles.
+
+Each run starts a fresh interpreter under ``python -X importtime``, sets up
+Django, loads the URLconf and builds the WSGI handler, which is what a new
+worker does before it can serve its first request. The import log on stderr
+is parsed for the number of modules imported, the total import time and the
+slowest top-level packages.
+
+Absolute milliseconds depend on the machine, so the tracked numbers are the
+module count per profile and the API profile's median import time as a
+fraction of the full profile's. Runs alternate between profiles so neither
+gets a warmer disk cache.
+
+Usage:
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 10 --output startup.json
+    python benchmarks/startup.py --baseline benchmarks/startup_baseline.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+FULL_PROFILE = 'levelup.settings'
+API_PROFILE = 'levelup.settings_api'
+PROFILES = (FULL_PROFILE, API_PROFILE)
+
+COLD_START = (
+    'import django; django.setup(); '
+    'from django.core.wsgi import get_wsgi_application; '
+    'get_wsgi_application(); '
+    'from django.urls import get_resolver; get_resolver().url_patterns'
+)
+
+
+def parse_importtime(stderr):
+    """Turn ``-X importtime`` output into totals
+
+    Returns:
+        tuple -- (module count, total microseconds,
+                  dict of cumulative microseconds per top level package)
+    """
+    packages = {}
+    modules = 0
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        modules += 1
+        total += int(self_us)
+        # Nested imports are indented; only top level entries carry the
+        # whole cost of their package.
+        if not name.startswith(' ' * 2):
+            package = name.strip().split('.')[0]
+            packages[package] = packages.get(package, 0) + int(cumulative_us)
+    return modules, total, packages
+
+
+def measure(settings_module):
+    """Run one cold start under the given settings module"""
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', COLD_START],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def run(runs):
+    """Collect module counts and median import times per profile"""
+    samples = {profile: {'modules': [], 'totals': [], 'packages': {}} for profile in PROFILES}
+    for _ in range(runs):
+        for profile in PROFILES:
+            modules, total, packages = measure(profile)
+            sample = samples[profile]
+            sample['modules'].append(modules)
+            sample['totals'].append(total)
+            for package, cost in packages.items():
+                sample['packages'].setdefault(package, []).append(cost)
+
+    report = {}
+    for profile, sample in samples.items():
+        slowest = sorted(
+            ((package, statistics.median(costs)) for package, costs in sample['packages'].items()),
+            key=lambda item: item[1], reverse=True,
+        )[:10]
+        report[profile] = {
+            'modules': max(sample['modules']),
+            'median_ms': round(statistics.median(sample['totals']) / 1000, 1),
+            'slowest_packages_ms': {
+                package: round(cost / 1000, 1) for package, cost in slowest
+            },
+        }
+    report['api_to_full_ratio'] = round(
+        report[API_PROFILE]['median_ms'] / report[FULL_PROFILE]['median_ms'], 2)
+    return report
+
+
+def regressions(report, baseline, tolerance, module_slack):
+    """Compare a report with a baseline report
+
+    Returns:
+        list -- a description of each regression found
+    """
+    found = []
+    for profile in PROFILES:
+        if profile not in baseline:
+            continue
+        allowed = baseline[profile]['modules'] + module_slack
+        if report[profile]['modules'] > allowed:
+            found.append(f"{profile} imports {report[profile]['modules']} modules "
+                         f"(baseline {baseline[profile]['modules']})")
+    if 'api_to_full_ratio' in baseline:
+        allowed = baseline['api_to_full_ratio'] + tolerance
+        if report['api_to_full_ratio'] > allowed:
+            found.append(f"API profile import time is {report['api_to_full_ratio']} of "
+                         f"the full profile's (baseline {baseline['api_to_full_ratio']})")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=9)
+    parser.add_argument('--output', type=Path,
+                        help='write the report as JSON to this path')
+    parser.add_argument('--baseline', type=Path,
+                        help='exit non-zero if the report regressed against this one')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='allowed increase of the API/full import time ratio')
+    parser.add_argument('--module-slack', type=int, default=10,
+                        help='allowed extra modules per profile')
+    args = parser.parse_args()
+
+    report = run(args.runs)
+    for profile in PROFILES:
+        numbers = report[profile]
+        print(f"{profile}: {numbers['modules']} modules, median {numbers['median_ms']} ms")
+        for package, cost in numbers['slowest_packages_ms'].items():
+            print(f"    {package:<24} {cost} ms")
+    print(f"API/full import time ratio: {report['api_to_full_ratio']}")
+
+    if args.output:
+        tracked = {profile: {'modules': report[profile]['modules']} for profile in PROFILES}
+        tracked['api_to_full_ratio'] = report['api_to_full_ratio']
+        args.output.write_text(json.dumps(tracked, indent=4) + '\n')
+
+    if args.baseline:
+        found = regressions(report, json.loads(args.baseline.read_text()),
+                            args.tolerance, args.module_slack)
+        for regression in found:
+            print(f'Startup regressed: {regression}')
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
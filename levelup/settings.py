@@ -10,6 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.0/ref/settings/
 """
 
+import os
+from datetime import timedelta
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,13 +48,53 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'levelupapi.authentication.ExpiringTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# Clients that send Accept: application/msgpack get MessagePack instead of
+# JSON, but only when the optional msgpack package is installed.
+if find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].insert(
+        1, 'levelupapi.renderers.MessagePackRenderer')
+
+# Token revocations, replica pins and idempotency keys live in this cache, so
+# every worker process has to share it. LocMem is per process and only fits a
+# single-process dev server; set LEVELUP_REDIS_URL (e.g. redis://localhost:6379/0)
+# anywhere more than one worker serves requests.
+if os.environ.get('LEVELUP_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['LEVELUP_REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Auth tokens stop working this long after they are issued. Logging in again
+# or POSTing to /token/rotate issues a fresh one; run the
+# purge_expired_tokens command to clear the old rows out.
+TOKEN_TTL = timedelta(days=14)
+
+# Verified tokens are cached per process for this long, up to this many
+TOKEN_CACHE_SECONDS = 300
+TOKEN_CACHE_SIZE = 10000
+
+# How often each process checks the shared cache for revoked tokens
+TOKEN_REVOCATION_POLL_SECONDS = 1
+
 CORS_ORIGIN_WHITELIST = (
     'http://localhost:3000',
     'http://127.0.0.1:3000'
@@ -59,6 +102,7 @@ CORS_ORIGIN_WHITELIST = (
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'levelupapi.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,7 +110,28 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'levelupapi.idempotency.IdempotencyMiddleware',
+    'levelupapi.replicas.ReplicaPinningMiddleware',
+]
+
+# Responses smaller than this many bytes are not compressed
+COMPRESSION_MIN_SIZE = 1024
+
+# POSTs to these paths sent with an Idempotency-Key header have their
+# response kept for IDEMPOTENCY_TTL seconds so retries are answered without
+# running the view again. Never add /login or /token/rotate: replaying them
+# would skip the password check or the rotation. Tokens in stored responses
+# (/register) are swapped for the user's current token on replay.
+IDEMPOTENT_PATHS = [
+    r'^/register$',
+    r'^/events$',
+    r'^/games$',
+    r'^/events/\d+/signup$',
 ]
+IDEMPOTENCY_TTL = 60 * 60 * 24
+
+# How long a retry waits for the first attempt to finish before giving up
+IDEMPOTENCY_WAIT_SECONDS = 10
 
 ROOT_URLCONF = 'levelup.urls'
 
@@ -99,6 +164,34 @@ DATABASES = {
     }
 }
 
+# Read replicas. Reads are spread over these aliases and writes stay on
+# `default`; see levelupapi/replicas.py. For local testing list SQLite files
+# in LEVELUP_REPLICAS, e.g. LEVELUP_REPLICAS=replica1.sqlite3,replica2.sqlite3
+# They are opened read-only, so a missing file fails instead of being created.
+DATABASE_REPLICAS = []
+for index, name in enumerate(filter(None, os.environ.get('LEVELUP_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{index}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{BASE_DIR / name.strip()}?mode=ro',
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{index}')
+
+# replica1 and replica2 always exist so the routing tests have something to
+# route to, whatever runs them; under test they mirror the test database.
+# An alias only takes reads when it is listed in DATABASE_REPLICAS, so these
+# get no traffic unless LEVELUP_REPLICAS defined them above.
+for alias in ('replica1', 'replica2'):
+    DATABASES.setdefault(alias, {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}})
+
+DATABASE_ROUTERS = ['levelupapi.replicas.ReplicaRouter']
+
+# How long a gamer's reads stay on the primary after they write something
+REPLICA_STICKY_SECONDS = 5
+
+# How often an unreachable replica is retried, in seconds
+REPLICA_HEALTH_CHECK_INTERVAL = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
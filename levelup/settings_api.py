@@ -0,0 +1,62 @@
+"""
+API-only settings for levelup project.
+
+Use this profile on workers that only serve the token-authenticated API:
+
+    DJANGO_SETTINGS_MODULE=levelup.settings_api
+
+It reuses everything from levelup.settings but drops the admin, sessions,
+messages and staticfiles apps along with the middleware that only exists to
+support them, so requests skip the session, CSRF, auth and messages
+middleware and the app registry has fewer apps to load and check.
+
+It does not noticeably shrink import time: DRF's views import its schema
+generator, which imports django.contrib.admindocs and with it the admin and
+messages modules, whatever is in INSTALLED_APPS.
+"""
+
+from .settings import *  # noqa: F401,F403 pylint: disable=wildcard-import,unused-wildcard-import
+
+# auth and contenttypes stay because Gamer and authtoken.Token point at User
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'rest_framework',
+    'rest_framework.authtoken',
+    'corsheaders',
+    'levelupapi',
+]
+
+# DRF's TokenAuthentication sets request.user itself, so neither the session
+# nor the auth middleware is needed. APIView is csrf exempt already.
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'levelupapi.compression.CompressionMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'levelupapi.idempotency.IdempotencyMiddleware',
+    'levelupapi.replicas.ReplicaPinningMiddleware',
+]
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.request',
+            ],
+        },
+    },
+]
+
+# The browsable API needs templates and static files, neither of which are
+# served by this profile.
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': [
+        renderer for renderer in REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']
+        if renderer != 'rest_framework.renderers.BrowsableAPIRenderer'
+    ],
+}
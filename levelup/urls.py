@@ -1,9 +1,9 @@
-from django.contrib import admin
+from django.apps import apps
 from django.conf.urls import include
 from django.urls import path
 from rest_framework import routers
 from levelupapi.views import GameTypeView, EventView, GameView
-from levelupapi.views import register_user, login_user
+from levelupapi.views import register_user, login_user, rotate_token
 
 # The trailing_slash=False tells the router to accept /gametypes instead of /gametypes/. 
 # It’s a very annoying error to come across, when your server is not responding and the 
@@ -24,6 +24,13 @@ urlpatterns = [
     path('register', register_user),
     # Requests to http://localhost:8000/login will be routed to the login_user function
     path('login', login_user),
-    path('admin/', admin.site.urls),
+    # Swaps the caller's token for a new one and revokes the old one
+    path('token/rotate', rotate_token),
     path('', include(router.urls)),
-]
\ No newline at end of file
+]
+
+# The API-only settings profile leaves the admin out of INSTALLED_APPS, so
+# only mount it when it is installed.
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+    urlpatterns.append(path('admin/', admin.site.urls))
@@ -1,3 +1,114 @@
 from django.contrib import admin
+from django.db.models import Q
 
-# Register your models here.
+from levelupapi.models import Event, EventGamer, Game, GameType, Gamer
+
+# These tables get big, so every changelist here follows the same rules:
+# - list_select_related covers every FK shown in list_display, so a page of
+#   rows is one query instead of one per row
+# - show_full_result_count=False skips the extra unfiltered COUNT(*)
+# - searches go through IndexedSearchAdmin, so they only ever run lookups
+#   an index can serve
+# - FK widgets are autocompletes rather than a <select> of every row
+
+
+class IndexedSearchAdmin(admin.ModelAdmin):
+    """Search that indexes can answer
+
+    Django's ^field and =field lookups are case-insensitive, which turns
+    into UPPER(column) LIKE UPPER('term%') on PostgreSQL and can't use a
+    plain index. Here search_fields are matched with a case-sensitive
+    prefix (startswith), which the index Django adds for db_index and
+    unique CharFields serves, and a numeric term is also looked up exactly
+    in exact_search_fields.
+    """
+    exact_search_fields = ('pk',)
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        query = Q()
+        for field in self.get_search_fields(request):
+            query |= Q(**{f'{field}__startswith': term})
+        # Anything longer can't be a bigint id
+        if term.isdigit() and len(term) < 19:
+            for field in self.exact_search_fields:
+                query |= Q(**{field: int(term)})
+        # Only forward relations are searched, so rows can't repeat
+        return queryset.filter(query), False
+
+
+@admin.register(GameType)
+class GameTypeAdmin(IndexedSearchAdmin):
+    list_display = ('id', 'label')
+    # A handful of rows, so no index needed
+    search_fields = ('label',)
+    show_full_result_count = False
+
+
+@admin.register(Gamer)
+class GamerAdmin(IndexedSearchAdmin):
+    list_display = ('id', 'username', 'bio')
+    list_select_related = ('user',)
+    search_fields = ('user__username',)
+    autocomplete_fields = ('user',)
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # Gamer's __str__ uses the username, which autocomplete results and
+        # FK columns on other admins render too
+        return super().get_queryset(request).select_related('user')
+
+    @admin.display(ordering='user__username')
+    def username(self, gamer):
+        return gamer.user.username
+
+
+@admin.register(Game)
+class GameAdmin(IndexedSearchAdmin):
+    list_display = ('id', 'title', 'maker', 'game_type', 'gamer', 'number_of_players', 'skill_level')
+    list_select_related = ('game_type', 'gamer__user')
+    search_fields = ('title',)
+    autocomplete_fields = ('game_type', 'gamer')
+    show_full_result_count = False
+
+
+@admin.register(Event)
+class EventAdmin(IndexedSearchAdmin):
+    list_display = ('id', 'description', 'date', 'time', 'game', 'organizer')
+    list_select_related = ('game', 'organizer__user')
+    search_fields = ('game__title',)
+    autocomplete_fields = ('game', 'organizer')
+    ordering = ('-date', '-time')
+    show_full_result_count = False
+    actions = ('cancel_events', 'remove_attendees')
+
+    @admin.action(permissions=['delete'], description='Cancel selected events')
+    def cancel_events(self, request, queryset):
+        # Log before deleting, like the built-in delete action does
+        if hasattr(self, 'log_deletions'):
+            self.log_deletions(request, queryset)
+        else:
+            for event in queryset:
+                self.log_deletion(request, event, str(event))
+        # Attendees have no signals or cascades of their own, so the
+        # collector removes them with one DELETE rather than row by row
+        cancelled = queryset.count()
+        self.delete_queryset(request, queryset)
+        self.message_user(request, f'Cancelled {cancelled} events.')
+
+    @admin.action(permissions=['change'], description='Remove all attendees from selected events')
+    def remove_attendees(self, request, queryset):
+        removed, _ = EventGamer.objects.filter(event__in=queryset.values('id')).delete()
+        self.message_user(request, f'Removed {removed} attendees.')
+
+
+@admin.register(EventGamer)
+class EventGamerAdmin(IndexedSearchAdmin):
+    list_display = ('id', 'event', 'gamer')
+    list_select_related = ('event', 'gamer__user')
+    search_fields = ('gamer__user__username',)
+    exact_search_fields = ('pk', 'event_id')
+    autocomplete_fields = ('event', 'gamer')
+    show_full_result_count = False
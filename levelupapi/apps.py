@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class LevelupapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'levelupapi'
+
+    def ready(self):
+        # Connects the signal receivers and registers the system checks
+        from levelupapi import checks, signals  # noqa: F401 pylint: disable=import-outside-toplevel,unused-import
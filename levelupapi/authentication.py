@@ -0,0 +1,186 @@
+"""Expiring token authentication with an in-process token cache
+
+Tokens expire TOKEN_TTL after they were created. Tokens missing from the
+cache are verified against the primary database, never a replica, and kept in
+a per-process cache for up to TOKEN_CACHE_SECONDS, so an authenticated
+request normally costs no database query at all. Only plain values are
+cached; every request gets its own User and Token instances, and the User
+only loads its remaining fields from the database if something reads them.
+
+Deleting a token (logout, rotation) or deactivating its user has to reach
+every worker's cache. Each revocation bumps a version counter in the shared Django cache and stores the
+revoked key under that version. Workers look at the counter at most once
+every TOKEN_REVOCATION_POLL_SECONDS and drop whatever was revoked since the
+version they last saw.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+REVOCATION_VERSION_KEY = 'levelup:token-revocations:version'
+
+
+def _revocation_key(version):
+    return f'levelup:token-revocations:{version}'
+
+
+def token_expires_at(token):
+    """When the given Token stops being accepted"""
+    return expires_at(token.created)
+
+
+def expires_at(created):
+    return created + settings.TOKEN_TTL
+
+
+def token_expired(token):
+    return token_expires_at(token) <= timezone.now()
+
+
+def revoke_token(key):
+    """Tell every worker to forget the given token key"""
+    cache.add(REVOCATION_VERSION_KEY, 0, None)
+    version = cache.incr(REVOCATION_VERSION_KEY)
+    # Workers that fall further behind than this just flush their cache
+    cache.set(_revocation_key(version), key, settings.TOKEN_CACHE_SECONDS * 2)
+    token_cache.discard(key)
+
+
+class CachedToken:
+    """What is kept per verified token: plain values, no model instances"""
+    __slots__ = ('user_id', 'created', 'is_active')
+
+    def __init__(self, user_id, created, is_active):
+        self.user_id = user_id
+        self.created = created
+        self.is_active = is_active
+
+    def credentials(self, key):
+        """A fresh (user, token) pair for one request
+
+        The User only has its id and is_active loaded; any other field is
+        fetched from the database the first time it is read.
+        """
+        user = User.from_db(None, ['id', 'is_active'], [self.user_id, self.is_active])
+        token = Token(key=key, user=user, created=self.created)
+        return (user, token)
+
+
+class TokenCache:
+    """Bounded LRU of verified tokens for this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self._synced_at = 0.0
+
+    def get(self, key):
+        self._sync()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, token):
+        # Never cache a token past its expiry
+        lifetime = min(
+            settings.TOKEN_CACHE_SECONDS,
+            (token_expires_at(token) - timezone.now()).total_seconds(),
+        )
+        if lifetime <= 0:
+            return
+        entry = CachedToken(token.user_id, token.created, token.user.is_active)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + lifetime, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.TOKEN_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+            self._synced_at = 0.0
+
+    def _sync(self):
+        """Apply revocations published by other workers"""
+        now = time.monotonic()
+        if now - self._synced_at < settings.TOKEN_REVOCATION_POLL_SECONDS:
+            return
+        self._synced_at = now
+        version = cache.get(REVOCATION_VERSION_KEY, 0)
+        with self._lock:
+            seen = self._version
+            self._version = version
+        if seen is None or version == seen:
+            return
+        revoked = {}
+        if version > seen:
+            revoked = cache.get_many(
+                [_revocation_key(v) for v in range(seen + 1, version + 1)])
+        with self._lock:
+            if len(revoked) < version - seen or version < seen:
+                # Revocations fell out of the shared cache, or the cache was
+                # flushed; either way nothing cached here can be trusted.
+                self._entries.clear()
+                return
+            for key in revoked.values():
+                self._entries.pop(key, None)
+
+
+token_cache = TokenCache()
+
+
+class ExpiringTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that rejects expired tokens and caches valid ones"""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            user, token = self._verify(key)
+            if token_expired(token):
+                raise AuthenticationFailed('Token has expired.')
+            token_cache.put(key, token)
+            return (user, token)
+
+        if expires_at(cached.created) <= timezone.now():
+            token_cache.discard(key)
+            raise AuthenticationFailed('Token has expired.')
+        if not cached.is_active:
+            token_cache.discard(key)
+            raise AuthenticationFailed('User inactive or deleted.')
+        return cached.credentials(key)
+
+    def _verify(self, key):
+        """Look the token up on the primary
+
+        A replica may still have a token that was just revoked, and what is
+        read here is trusted for TOKEN_CACHE_SECONDS.
+        """
+        try:
+            token = Token.objects.using('default').select_related('user').get(key=key)
+        except Token.DoesNotExist as error:
+            raise AuthenticationFailed(_('Invalid token.')) from error
+        if not token.user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        return (token.user, token)
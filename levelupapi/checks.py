@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.checks import Warning, register  # pylint: disable=redefined-builtin
+
+
+@register(deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Token revocation, replica pins and idempotency keys need a shared cache"""
+    backend = settings.CACHES['default']['BACKEND']
+    if backend.endswith('LocMemCache') and not settings.DEBUG:
+        return [Warning(
+            'The default cache is per process (LocMemCache).',
+            hint=('With more than one worker, revoked or rotated tokens stay valid in '
+                  'other workers for up to TOKEN_CACHE_SECONDS, and replica pins and '
+                  'idempotency keys are not shared. Set LEVELUP_REDIS_URL.'),
+            id='levelupapi.W001',
+        )]
+    return []
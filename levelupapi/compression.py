@@ -0,0 +1,118 @@
+"""Negotiated response compression for the API
+
+gzip always works because it is in the standard library. brotli and zstd are
+used when their packages are installed and the client asks for them.
+"""
+import gzip
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _gzip(data):
+    # mtime=0 keeps the output stable so identical bodies compress identically
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _brotli(data):
+    return brotli.compress(data, quality=5)
+
+
+def _zstd(data):
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+# Server preference when a client accepts several codings with the same q
+CODECS = {}
+if zstandard is not None:
+    CODECS['zstd'] = _zstd
+if brotli is not None:
+    CODECS['br'] = _brotli
+CODECS['gzip'] = _gzip
+
+
+def parse_accept_encoding(header):
+    """Parse an Accept-Encoding header
+
+    Returns:
+        dict -- content coding mapped to its q value
+    """
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def choose_encoding(header):
+    """Pick the best available coding the client will accept, or None"""
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for coding in CODECS:
+        quality = accepted.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class CompressionMiddleware:
+    """Compress response bodies with the best coding the client accepts
+
+    Responses smaller than COMPRESSION_MIN_SIZE bytes are sent as is; for
+    those the framing overhead outweighs the saving and the CPU is wasted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        if len(response.content) < self.min_size:
+            return response
+
+        coding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if coding is None:
+            return response
+
+        compressed = CODECS[coding](response.content)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        response.headers['Content-Encoding'] = coding
+        # The compressed body is a different representation of the resource,
+        # so a strong ETag for the identity body no longer applies.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,148 @@
+"""Idempotency-Key support for POST requests
+
+A client that sends `Idempotency-Key: <unique value>` with a POST to one of
+the paths in IDEMPOTENT_PATHS can safely retry it. The first response,
+headers included, is stored in the default cache for IDEMPOTENCY_TTL seconds
+and replays get that stored response back without the view running again, so a retried /register doesn't hash the password
+twice and a retried POST /events doesn't create a second event.
+
+Only endpoints that create something are listed. /login and /token/rotate
+are left out on purpose: they exist to hand out tokens, and replaying them
+would skip the password check or the rotation. /register is listed but its
+response carries a token too, so for any stored response with a `token`
+field the key itself is cut out of the stored body and only the user it
+belongs to is kept. A replay fills in that user's current token, so tokens
+never sit in the cache and a token revoked since (rotation, logout) is
+never handed back.
+
+Keys are scoped to the caller's Authorization and Accept headers and the
+request path. A retry that arrives while the first attempt is still running
+waits up to IDEMPOTENCY_WAIT_SECONDS for it to finish rather than running
+the view too.
+"""
+import hashlib
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from rest_framework.authtoken.models import Token
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+
+_IN_FLIGHT = 'in-flight'
+
+
+def _cache_key(request, key):
+    scope = '\n'.join((
+        request.META.get('HTTP_AUTHORIZATION', ''), request.META.get('HTTP_ACCEPT', ''),
+        request.method, request.path, key,
+    ))
+    return 'levelup:idempotency:' + hashlib.sha256(scope.encode()).hexdigest()
+
+
+def _stored_body(response):
+    """The response body to store, with any token key cut out of it
+
+    Returns:
+        tuple -- (body split around the token key, id of the token's user),
+                 or None if the token can't be found to cut it out
+    """
+    data = getattr(response, 'data', None)
+    key = data.get('token') if isinstance(data, dict) else None
+    if not key:
+        return [response.content], None
+    token = Token.objects.filter(key=key).only('user_id').first()
+    if token is None or key.encode() not in response.content:
+        return None
+    return response.content.split(key.encode()), token.user_id
+
+
+def _replay(stored):
+    status, headers, chunks, _, token_user_id = stored
+    content = chunks[0]
+    if token_user_id is not None:
+        # Lazily, so loading the middleware doesn't import the API views
+        from levelupapi.views.auth import issue_token  # pylint: disable=import-outside-toplevel
+        content = issue_token(token_user_id).key.encode().join(chunks)
+    response = HttpResponse(content, status=status)
+    for name, value in headers:
+        response[name] = value
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+class IdempotencyMiddleware:
+    """Serve retried POSTs from the stored first response"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.ttl = getattr(settings, 'IDEMPOTENCY_TTL', 60 * 60 * 24)
+        self.wait_seconds = getattr(settings, 'IDEMPOTENCY_WAIT_SECONDS', 10)
+        # Long enough for any request to finish, short enough that a worker
+        # dying mid-request doesn't block the key for long
+        self.lock_seconds = getattr(settings, 'IDEMPOTENCY_LOCK_SECONDS', 30)
+        self.paths = [re.compile(path) for path in getattr(settings, 'IDEMPOTENT_PATHS', ())]
+
+    def __call__(self, request):
+        key = request.META.get(HEADER)
+        if (request.method != 'POST' or not key
+                or not any(path.match(request.path_info) for path in self.paths)):
+            return self.get_response(request)
+        if len(key) > 255:
+            return JsonResponse(
+                {'message': 'Idempotency-Key must be at most 255 characters'}, status=400)
+
+        cache_key = _cache_key(request, key)
+        digest = hashlib.sha256(request.body).hexdigest()
+
+        # cache.add only succeeds for one caller, which makes it the owner
+        while not cache.add(cache_key, _IN_FLIGHT, self.lock_seconds):
+            stored = self._wait(cache_key)
+            if stored is None:
+                # The other attempt gave up or died; try to take over
+                continue
+            if stored == _IN_FLIGHT:
+                return JsonResponse(
+                    {'message': 'A request with this Idempotency-Key is still in progress'},
+                    status=409)
+            if stored[3] != digest:
+                return JsonResponse(
+                    {'message': 'Idempotency-Key was already used with a different request'},
+                    status=422)
+            return _replay(stored)
+
+        try:
+            response = self.get_response(request)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+
+        # Server errors are worth retrying for real, so don't pin them
+        body = None
+        if response.status_code < 500 and not response.streaming:
+            body = _stored_body(response)
+        if body is None:
+            cache.delete(cache_key)
+        else:
+            cache.set(cache_key, (
+                response.status_code, list(response.items()), body[0], digest, body[1],
+            ), self.ttl)
+        return response
+
+    def _wait(self, cache_key):
+        """Poll until the in-flight attempt stores its response
+
+        Returns:
+            The stored response, None if the key was released, or the in
+            flight marker if waiting timed out
+        """
+        deadline = time.monotonic() + self.wait_seconds
+        delay = 0.01
+        while True:
+            stored = cache.get(cache_key)
+            if stored != _IN_FLIGHT or time.monotonic() >= deadline:
+                return stored
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Delete auth tokens older than TOKEN_TTL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running and purge every INTERVAL seconds',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.purge()
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def purge(self):
+        cutoff = timezone.now() - settings.TOKEN_TTL
+        deleted = 0
+        # Delete in batches so a large backlog never loads every expired row
+        # into memory at once
+        while True:
+            batch = list(Token.objects.filter(created__lte=cutoff)
+                         .values_list('pk', flat=True)[:BATCH_SIZE])
+            if not batch:
+                break
+            count, _ = Token.objects.filter(pk__in=batch).delete()
+            deleted += count
+        self.stdout.write(f'Purged {deleted} expired tokens')
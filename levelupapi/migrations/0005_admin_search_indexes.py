@@ -0,0 +1,23 @@
+# Generated by Django 4.0.4 on 2026-10-19 14:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('levelupapi', '0004_event_attendees'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='event',
+            name='date',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='game',
+            name='title',
+            field=models.CharField(db_index=True, max_length=55),
+        ),
+    ]
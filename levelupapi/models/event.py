@@ -4,13 +4,17 @@ class Event(models.Model):
 
     game = models.ForeignKey("Game", on_delete=models.CASCADE)
     description = models.CharField(max_length=50)
-    date = models.DateField()
+    # indexed for the admin's date ordering
+    date = models.DateField(db_index=True)
     time = models.TimeField()
     organizer = models.ForeignKey("Gamer", on_delete=models.CASCADE)
     # list of gamers attending the event, many to many through EventGamer table, attendees is related to events
     # you don't have to use the through if you already have the table created; it will create a table automatically if you don't specify
     attendees = models.ManyToManyField("Gamer", through="EventGamer", related_name="events")
 
+    def __str__(self):
+        return self.description
+
     # it's on the model, but not in the database
     # you could add a "readTime" property or a "abbreviatedDisplay" that has to be calculated before it is added
     @property
@@ -6,8 +6,12 @@ from django.db import models
 class Game(models.Model):
 
     game_type = models.ForeignKey("GameType", on_delete=models.CASCADE)
-    title = models.CharField(max_length=55)
+    # indexed for the admin's prefix search
+    title = models.CharField(max_length=55, db_index=True)
     maker = models.CharField(max_length=55)
     gamer = models.ForeignKey("Gamer", on_delete=models.CASCADE)
     number_of_players = models.IntegerField()
-    skill_level = models.IntegerField()
\ No newline at end of file
+    skill_level = models.IntegerField()
+
+    def __str__(self):
+        return self.title
\ No newline at end of file
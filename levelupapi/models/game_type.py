@@ -2,4 +2,7 @@ from django.db import models
 
 class GameType(models.Model):
 
-    label = models.CharField(max_length=50)
\ No newline at end of file
+    label = models.CharField(max_length=50)
+
+    def __str__(self):
+        return self.label
\ No newline at end of file
@@ -6,4 +6,7 @@ class Gamer(models.Model):
     # user is a one to one because one user can only be one gamer; otherwise it would be foreign key 
     # because a user could have multiple games, events, etc
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    bio = models.CharField(max_length=50)
\ No newline at end of file
+    bio = models.CharField(max_length=50)
+
+    def __str__(self):
+        return self.user.username
\ No newline at end of file
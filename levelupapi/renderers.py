@@ -0,0 +1,39 @@
+"""Extra DRF renderers for the API"""
+from decimal import Decimal
+
+from rest_framework.renderers import BaseRenderer
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def _default(obj):
+    # Serializers already turn dates and times into strings; anything left
+    # over is sent the same way JSONRenderer would send it.
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not MessagePack serializable')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renders data as MessagePack
+
+    Only register this when the msgpack package is installed.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default, use_bin_type=True)
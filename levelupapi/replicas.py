@@ -0,0 +1,183 @@
+"""Read replica routing
+
+Reads made while serving a request go to one of the healthy aliases in
+DATABASE_REPLICAS, picked round-robin per request, and writes go to
+`default`. Reads made outside a request (management commands, the shell)
+always use `default`.
+
+To keep read-your-writes, any POST/PUT/PATCH/DELETE request sends all of
+its queries to the primary, and the token that made the write is pinned to the
+primary for REPLICA_STICKY_SECONDS so the follow-up reads see the new rows
+even if replication is lagging.
+
+Pins are kept in the default cache. With more than one worker process that
+cache needs to be shared (memcached, redis) for pins to follow the client.
+"""
+import hashlib
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class _RequestRouting:
+    """Routing state for the request being served"""
+
+    def __init__(self, use_primary):
+        # True once the request must read from the primary
+        self.use_primary = use_primary
+        # The replica picked for this request, so all of its reads see the
+        # same snapshot instead of hopping between replicas at different lag
+        self.replica = None
+
+
+# Only set by ReplicaPinningMiddleware, for the duration of one request
+_routing = ContextVar('replica_routing', default=None)
+
+
+def _pin_key(token):
+    # Keep bearer tokens out of cache keys
+    return 'levelup:replica-pin:' + hashlib.sha256(token.encode()).hexdigest()
+
+
+def _request_token(request):
+    """The auth token key sent with the request, if any"""
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    keyword, _, key = header.partition(' ')
+    if keyword == 'Token' and key:
+        return key.strip()
+    return None
+
+
+def replica_names():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+class ReplicaHealth:
+    """Remembers which replicas answered the last time they were checked
+
+    A replica is only probed again once REPLICA_HEALTH_CHECK_INTERVAL seconds
+    have passed, so a healthy replica costs nothing on the hot path and a dead
+    one is skipped instead of failing every read routed to it. A query that
+    fails with OperationalError on a replica marks it unhealthy straight away.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = {}
+
+    def is_healthy(self, alias):
+        interval = getattr(settings, 'REPLICA_HEALTH_CHECK_INTERVAL', 30)
+        now = time.monotonic()
+        with self._lock:
+            checked = self._checked.get(alias)
+            if checked is not None and now - checked[0] < interval:
+                return checked[1]
+        healthy = self._probe(alias)
+        with self._lock:
+            self._checked[alias] = (now, healthy)
+        return healthy
+
+    def mark_unhealthy(self, alias):
+        with self._lock:
+            self._checked[alias] = (time.monotonic(), False)
+
+    def reset(self):
+        with self._lock:
+            self._checked.clear()
+
+    @staticmethod
+    def _probe(alias):
+        # Connecting alone isn't enough: SQLite happily opens (or creates) a
+        # file without any of our tables in it
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT 1 FROM django_migrations LIMIT 1')
+        except OperationalError:
+            return False
+        return True
+
+
+health = ReplicaHealth()
+
+
+def mark_unhealthy_on_failure(execute, sql, params, many, context):
+    """Execute wrapper that takes a replica out of rotation when a query fails"""
+    try:
+        return execute(sql, params, many, context)
+    except OperationalError:
+        health.mark_unhealthy(context['connection'].alias)
+        raise
+
+
+class ReplicaRouter:
+    """Send reads to replicas and writes to the primary"""
+
+    def __init__(self):
+        self._counter = itertools.count()
+
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is None or routing.use_primary:
+            return 'default'
+        if routing.replica is None:
+            replicas = [alias for alias in replica_names() if health.is_healthy(alias)]
+            if not replicas:
+                routing.use_primary = True
+                return 'default'
+            routing.replica = replicas[next(self._counter) % len(replicas)]
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        # Django also asks this when it only needs to place an instance (e.g.
+        # assigning a foreign key), so it can't be used to detect writes.
+        # Requests that write use unsafe methods, which the middleware
+        # already sends to the primary.
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        pool = {'default', *replica_names()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """Route a request's reads to the primary when it needs fresh data
+
+    Writes (POST, PUT, DELETE, ...) read from the primary for the whole
+    request. Afterwards the caller's token is pinned to the primary for
+    REPLICA_STICKY_SECONDS, along with any token handed back in the response
+    (/register, /login, /token/rotate) since replicas may not have it yet.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sticky_seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+
+    def __call__(self, request):
+        token = _request_token(request)
+        pinned = request.method not in SAFE_METHODS or (
+            token is not None and cache.get(_pin_key(token)) is not None
+        )
+        reset = _routing.set(_RequestRouting(pinned))
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(reset)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            data = getattr(response, 'data', None)
+            tokens = [token]
+            if isinstance(data, dict):
+                tokens.append(data.get('token'))
+            for key in filter(None, tokens):
+                cache.set(_pin_key(key), True, self.sticky_seconds)
+        return response
@@ -0,0 +1,37 @@
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from levelupapi.authentication import revoke_token, token_expired
+from levelupapi.replicas import mark_unhealthy_on_failure, replica_names
+
+
+@receiver(post_delete, sender=Token)
+def revoke_deleted_token(sender, instance, **kwargs):
+    """Drop a deleted token from every worker's token cache"""
+    # Expired tokens are already rejected without a revocation
+    if not token_expired(instance):
+        # Publishing before the delete commits would let another worker
+        # re-read the still-present row and cache it again
+        transaction.on_commit(partial(revoke_token, instance.key))
+
+
+@receiver(post_save, sender=User)
+def revoke_inactive_users_tokens(sender, instance, **kwargs):
+    """Lock a deactivated user out of every worker right away"""
+    if not instance.is_active:
+        for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+            transaction.on_commit(partial(revoke_token, key))
+
+
+@receiver(connection_created)
+def watch_replica_connection(sender, connection, **kwargs):
+    """Take a replica out of rotation as soon as a query on it fails"""
+    if (connection.alias in replica_names()
+            and mark_unhealthy_on_failure not in connection.execute_wrappers):
+        connection.execute_wrappers.append(mark_unhealthy_on_failure)
@@ -1,3 +1,694 @@
-from django.test import TestCase
+import datetime
+import gzip
+import pickle
+import threading
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib import admin
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from levelupapi import authentication, compression, idempotency, renderers, replicas
+from levelupapi.authentication import ExpiringTokenAuthentication, TokenCache, token_cache
+from levelupapi.views.auth import _replace_token
+from levelupapi.models import Event, EventGamer, Game, GameType, Gamer
+
+
+@skipUnless(apps.is_installed('django.contrib.admin'), 'admin is not installed')
+class AdminChangelistQueryTests(TestCase):
+    """Changelist pages must cost the same number of queries however many
+    rows they show, i.e. no query per row for FK columns."""
+
+    def setUp(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin_user)
+
+    def add_rows(self, count):
+        start = Gamer.objects.count()
+        for i in range(start, start + count):
+            user = User.objects.create(username=f'gamer{i}')
+            gamer = Gamer.objects.create(user=user, bio='Bio')
+            game_type = GameType.objects.create(label=f'Type {i}')
+            game = Game.objects.create(
+                game_type=game_type, title=f'Game {i}', maker='Maker',
+                gamer=gamer, number_of_players=4, skill_level=2,
+            )
+            event = Event.objects.create(
+                game=game, description=f'Event {i}', date=datetime.date(2022, 5, 1),
+                time=datetime.time(19, 0), organizer=gamer,
+            )
+            EventGamer.objects.create(event=event, gamer=gamer)
+
+    def clear_rows(self):
+        GameType.objects.all().delete()
+        Gamer.objects.all().delete()
+        User.objects.filter(is_superuser=False).delete()
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_query_count_is_bounded(self):
+        for model in (Event, Game, Gamer, EventGamer, GameType):
+            with self.subTest(model=model.__name__):
+                self.clear_rows()
+                url = reverse(f'admin:levelupapi_{model._meta.model_name}_changelist')
+                self.add_rows(2)
+                few = self.count_queries(url)
+                self.add_rows(20)
+                self.assertEqual(model.objects.count(), 22)
+                many = self.count_queries(url)
+                self.assertEqual(few, many)
+                self.assertLessEqual(many, 10)
+
+    def test_search_query_count_is_bounded(self):
+        self.add_rows(5)
+        url = reverse('admin:levelupapi_event_changelist')
+        self.assertLessEqual(self.count_queries(url + '?q=Game'), 10)
+
+    def search(self, model, term):
+        model_admin = admin.site._registry[model]  # pylint: disable=protected-access
+        request = RequestFactory().get('/')
+        queryset, _ = model_admin.get_search_results(request, model.objects.all(), term)
+        return queryset
+
+    def test_search_uses_prefix_and_exact_lookups(self):
+        self.add_rows(12)
+        for model in (Event, Game, Gamer, EventGamer, GameType):
+            with self.subTest(model=model.__name__):
+                nodes = [self.search(model, '1').query.where]
+                lookups = set()
+                while nodes:
+                    node = nodes.pop()
+                    nodes.extend(getattr(node, 'children', ()))
+                    if hasattr(node, 'lookup_name'):
+                        lookups.add(node.lookup_name)
+                self.assertEqual(lookups, {'startswith', 'exact'})
+
+    def test_search_matches_prefix_or_id(self):
+        self.add_rows(12)
+        game = Game.objects.get(title='Game 11')
+        self.assertEqual(
+            set(self.search(Game, 'Game 1').values_list('title', flat=True)),
+            {'Game 1', 'Game 10', 'Game 11'},
+        )
+        self.assertEqual(list(self.search(Game, str(game.pk))), [game])
+        self.assertEqual(list(self.search(Game, '')), list(Game.objects.all()))
+        self.assertEqual(
+            list(self.search(Event, 'Game 11').values_list('game', flat=True)), [game.pk])
+
+    def test_remove_attendees_action(self):
+        self.add_rows(3)
+        events = list(Event.objects.values_list('pk', flat=True)[:2])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('admin:levelupapi_event_changelist'), {
+                'action': 'remove_attendees', ACTION_CHECKBOX_NAME: events,
+            })
+        deletes = [q for q in queries if q['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(EventGamer.objects.count(), 1)
+        self.assertEqual(Event.objects.count(), 3)
+
+    def test_cancel_events_action(self):
+        # Only importable with the admin installed
+        from django.contrib.admin.models import DELETION, LogEntry  # pylint: disable=import-outside-toplevel
+        self.add_rows(3)
+        events = list(Event.objects.values_list('pk', flat=True)[:2])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('admin:levelupapi_event_changelist'), {
+                'action': 'cancel_events', ACTION_CHECKBOX_NAME: events,
+            })
+        deletes = [q for q in queries if q['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 2)
+        self.assertEqual(Event.objects.count(), 1)
+        self.assertEqual(EventGamer.objects.count(), 1)
+        self.assertEqual(
+            LogEntry.objects.filter(action_flag=DELETION, object_id__in=map(str, events)).count(), 2)
+
+
+def _identity(data):
+    return data
+
+
+class AcceptEncodingTests(SimpleTestCase):
+
+    def setUp(self):
+        # Pin the available codecs so the tests don't depend on which
+        # optional packages are installed
+        patcher = mock.patch.dict(compression.CODECS, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        compression.CODECS.update({'zstd': _identity, 'br': _identity, 'gzip': _identity})
+
+    def test_parse_accept_encoding(self):
+        self.assertEqual(
+            compression.parse_accept_encoding('gzip, BR;q=0.5, zstd ; q=0, x;q=nope'),
+            {'gzip': 1.0, 'br': 0.5, 'zstd': 0.0, 'x': 0.0},
+        )
+        self.assertEqual(compression.parse_accept_encoding(''), {})
+
+    def test_prefers_highest_quality(self):
+        self.assertEqual(compression.choose_encoding('gzip, br;q=0.5'), 'gzip')
+
+    def test_server_preference_breaks_ties(self):
+        self.assertEqual(compression.choose_encoding('gzip, br, zstd'), 'zstd')
+
+    def test_q_zero_excludes_coding(self):
+        self.assertEqual(compression.choose_encoding('zstd;q=0, br;q=0, gzip'), 'gzip')
+        self.assertIsNone(compression.choose_encoding('gzip;q=0'))
+
+    def test_wildcard(self):
+        self.assertEqual(compression.choose_encoding('*'), 'zstd')
+        self.assertEqual(compression.choose_encoding('*;q=0.5, zstd;q=0'), 'br')
+        self.assertIsNone(compression.choose_encoding('*;q=0'))
+
+    def test_unknown_and_identity_codings(self):
+        self.assertIsNone(compression.choose_encoding('identity, compress, deflate'))
+
+    def test_unavailable_coding_is_skipped(self):
+        del compression.CODECS['zstd']
+        self.assertEqual(compression.choose_encoding('zstd, br;q=0.5'), 'br')
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100)
+class CompressionMiddlewareTests(SimpleTestCase):
+
+    def get(self, response, accept_encoding='gzip'):
+        middleware = compression.CompressionMiddleware(lambda request: response)
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return middleware(request)
+
+    def test_compresses_large_response(self):
+        body = b'{"events": []}' * 50
+        response = self.get(HttpResponse(body))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), body)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_small_response_is_not_compressed(self):
+        response = self.get(HttpResponse(b'x' * 99))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, b'x' * 99)
+        # Still varies, since a larger body would have been compressed
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_no_acceptable_coding(self):
+        response = self.get(HttpResponse(b'x' * 500), accept_encoding='identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_incompressible_body_is_sent_as_is(self):
+        body = bytes(range(256)) * 2
+        response = self.get(HttpResponse(gzip.compress(body)))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_already_encoded_response_is_untouched(self):
+        original = HttpResponse(b'x' * 500)
+        original['Content-Encoding'] = 'br'
+        response = self.get(original)
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response.content, b'x' * 500)
+
+    def test_strong_etag_is_weakened(self):
+        original = HttpResponse(b'x' * 500)
+        original['ETag'] = '"abc"'
+        self.assertEqual(self.get(original)['ETag'], 'W/"abc"')
+
+    def test_weak_etag_is_kept(self):
+        original = HttpResponse(b'x' * 500)
+        original['ETag'] = 'W/"abc"'
+        self.assertEqual(self.get(original)['ETag'], 'W/"abc"')
+
+    def test_appends_to_existing_vary(self):
+        original = HttpResponse(b'x' * 500)
+        original['Vary'] = 'Accept'
+        self.assertEqual(self.get(original)['Vary'], 'Accept, Accept-Encoding')
+
+
+@skipUnless(renderers.msgpack is not None, 'msgpack is not installed')
+class MessagePackRendererTests(SimpleTestCase):
+
+    def test_render(self):
+        data = [{'id': 1, 'attendees': [1, 2], 'joined': True, 'description': 'Game night'}]
+        rendered = renderers.MessagePackRenderer().render(data)
+        self.assertEqual(renderers.msgpack.unpackb(rendered), data)
+
+    def test_render_leftover_types(self):
+        data = {
+            'price': Decimal('1.50'),
+            'date': datetime.date(2022, 5, 1),
+            'ids': {3},
+        }
+        rendered = renderers.MessagePackRenderer().render(data)
+        self.assertEqual(renderers.msgpack.unpackb(rendered),
+                         {'price': '1.50', 'date': '2022-05-01', 'ids': [3]})
+
+    def test_render_none(self):
+        self.assertEqual(renderers.MessagePackRenderer().render(None), b'')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """replica1 and replica2 are test mirrors of default (see settings.py), so
+    every alias sees the same rows and the tests check where queries go."""
+    databases = {'default', 'replica1', 'replica2'}
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        replicas.health.reset()
+        user = User.objects.create(username='gamer')
+        self.gamer = Gamer.objects.create(user=user, bio='Bio')
+        self.game_type = GameType.objects.create(label='Board game')
+        self.token = Token.objects.create(user=user)
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+        # Token cache misses always read the primary; start cached so the
+        # tests see only the queries routing decides on
+        token_cache.put(self.token.key, self.token)
+        # Probe now so the probes' own queries don't show up in the requests
+        for alias in ('replica1', 'replica2'):
+            replicas.health.is_healthy(alias)
+
+    def queried_aliases(self, method, path, **extra):
+        """Make a request and return the set of aliases that were queried"""
+        captures = {alias: CaptureQueriesContext(connections[alias]) for alias in self.databases}
+        for capture in captures.values():
+            capture.__enter__()
+        try:
+            response = getattr(self.client, method)(path, **{**self.auth, **extra})
+        finally:
+            for capture in captures.values():
+                capture.__exit__(None, None, None)
+        self.assertLess(response.status_code, 400)
+        return {alias for alias, capture in captures.items() if len(capture)}
+
+    def test_reads_alternate_between_replicas(self):
+        used = [self.queried_aliases('get', '/gametypes') for _ in range(4)]
+        # Each request sticks to one replica and consecutive requests alternate
+        self.assertTrue(all(len(aliases) == 1 for aliases in used))
+        self.assertEqual(used[0], used[2])
+        self.assertEqual(used[1], used[3])
+        self.assertEqual(used[0] | used[1], {'replica1', 'replica2'})
+
+    def test_write_request_uses_primary_and_pins_token(self):
+        aliases = self.queried_aliases('post', '/games', content_type='application/json', data={
+            'title': 'Catan', 'maker': 'Kosmos', 'number_of_players': 4,
+            'skill_level': 2, 'game_type': self.game_type.pk,
+        })
+        self.assertEqual(aliases, {'default'})
+        # The follow-up read sees the new game on the primary
+        self.assertEqual(self.queried_aliases('get', '/games'), {'default'})
+
+    def test_pin_expires(self):
+        self.queried_aliases('post', '/token/rotate')
+        cache.clear()
+        token = Token.objects.select_related('user').get()
+        token_cache.put(token.key, token)
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+        self.assertNotIn('default', self.queried_aliases('get', '/gametypes'))
+
+    def test_token_cache_miss_reads_primary(self):
+        token_cache.clear()
+        with CaptureQueriesContext(connections['default']) as primary:
+            aliases = self.queried_aliases('get', '/gametypes')
+        self.assertEqual(len(aliases), 2)
+        self.assertIn('default', aliases)
+        self.assertTrue(any('authtoken_token' in query['sql'] for query in primary))
+
+    def test_pin_key_does_not_contain_token(self):
+        self.assertNotIn(self.token.key, replicas._pin_key(self.token.key))  # pylint: disable=protected-access
+
+    def test_reads_outside_a_request_use_primary(self):
+        self.assertEqual(GameType.objects.all().db, 'default')
+        # A write outside a request doesn't change where later requests read
+        GameType.objects.create(label='Card game')
+        self.assertNotIn('default', self.queried_aliases('get', '/gametypes'))
+
+    def test_unhealthy_replica_is_skipped(self):
+        replicas.health.mark_unhealthy('replica2')
+        used = [self.queried_aliases('get', '/gametypes') for _ in range(3)]
+        self.assertEqual(used, [{'replica1'}] * 3)
+
+    def test_falls_back_to_primary_without_healthy_replicas(self):
+        replicas.health.mark_unhealthy('replica1')
+        replicas.health.mark_unhealthy('replica2')
+        self.assertEqual(self.queried_aliases('get', '/gametypes'), {'default'})
+
+    def test_unhealthy_replica_is_probed_again(self):
+        replicas.health.mark_unhealthy('replica2')
+        with override_settings(REPLICA_HEALTH_CHECK_INTERVAL=0):
+            self.assertTrue(replicas.health.is_healthy('replica2'))
+
+    def test_probe_runs_a_query(self):
+        self.assertTrue(replicas.ReplicaHealth._probe('replica1'))  # pylint: disable=protected-access
+        with mock.patch.object(connections['replica1'], 'cursor', side_effect=OperationalError):
+            self.assertFalse(replicas.ReplicaHealth._probe('replica1'))  # pylint: disable=protected-access
+
+    def test_failed_query_marks_replica_unhealthy(self):
+        self.assertTrue(replicas.health.is_healthy('replica1'))
+        with self.assertRaises(OperationalError):
+            list(GameType.objects.using('replica1').raw('SELECT * FROM no_such_table'))
+        self.assertFalse(replicas.health.is_healthy('replica1'))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ExpiringTokenTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.user = User.objects.create_user(username='gamer', password='password')
+        Gamer.objects.create(user=self.user, bio='Bio')
+        self.token = Token.objects.create(user=self.user)
+
+    def authenticate(self, key=None):
+        return ExpiringTokenAuthentication().authenticate_credentials(key or self.token.key)
+
+    def get(self, key=None):
+        return self.client.get('/gametypes', HTTP_AUTHORIZATION=f'Token {key or self.token.key}')
+
+    def expire(self, token):
+        Token.objects.filter(pk=token.pk).update(
+            created=timezone.now() - datetime.timedelta(days=30))
+
+    def test_valid_token(self):
+        self.assertEqual(self.get().status_code, 200)
+
+    def test_expired_token_is_rejected(self):
+        self.expire(self.token)
+        self.assertEqual(self.get().status_code, 401)
+
+    def test_cached_token_costs_no_queries(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertIs(token.user, user)
+        self.assertEqual(token.key, self.token.key)
+
+    def test_cached_credentials_are_not_shared(self):
+        self.authenticate()
+        first, _ = self.authenticate()
+        second, _ = self.authenticate()
+        self.assertIsNot(first, second)
+        # Fields that weren't cached load from the database on demand
+        self.assertEqual(second.username, 'gamer')
+
+    def test_cached_token_still_expires(self):
+        self.authenticate()
+        later = timezone.now() + datetime.timedelta(days=30)
+        with mock.patch.object(authentication.timezone, 'now', return_value=later):
+            with self.assertRaises(AuthenticationFailed):
+                self.authenticate()
+
+    def test_deleted_token_is_revoked(self):
+        key = self.token.key
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(key)
+
+    def test_revocation_waits_for_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Token.objects.filter(pk=self.token.pk).delete()
+            # Other workers must not hear of it while the row can still be read
+            self.assertIsNone(cache.get(authentication.REVOCATION_VERSION_KEY))
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(cache.get(authentication.REVOCATION_VERSION_KEY), 1)
+
+    def test_deactivated_user_is_locked_out(self):
+        self.authenticate()
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.get().status_code, 401)
+
+    @override_settings(TOKEN_REVOCATION_POLL_SECONDS=0)
+    def test_revocation_reaches_other_workers(self):
+        other_worker = TokenCache()
+        other_worker.put(self.token.key, self.token)
+        self.assertIsNotNone(other_worker.get(self.token.key))
+        authentication.revoke_token(self.token.key)
+        self.assertIsNone(other_worker.get(self.token.key))
+
+    @override_settings(TOKEN_REVOCATION_POLL_SECONDS=0)
+    def test_lost_revocation_history_flushes_cache(self):
+        other_user = User.objects.create(username='other')
+        other_token = Token.objects.create(user=other_user)
+        other_worker = TokenCache()
+        other_worker.put(self.token.key, self.token)
+        other_worker.put(other_token.key, other_token)
+        other_worker.get(self.token.key)
+        authentication.revoke_token(self.token.key)
+        cache.delete(authentication._revocation_key(  # pylint: disable=protected-access
+            cache.get(authentication.REVOCATION_VERSION_KEY)))
+        self.assertIsNone(other_worker.get(other_token.key))
+
+    def test_rotate_token(self):
+        self.assertEqual(self.get().status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/token/rotate', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 200)
+        new_key = response.json()['token']
+        self.assertNotEqual(new_key, self.token.key)
+        self.assertEqual(self.get().status_code, 401)
+        self.assertEqual(self.get(new_key).status_code, 200)
+
+    def test_repeated_rotation_of_the_same_token(self):
+        first = _replace_token(self.token)
+        # A second rotation racing the first still holds the old token
+        second = _replace_token(self.token)
+        self.assertEqual(first.key, second.key)
+        self.assertEqual(Token.objects.count(), 1)
+
+    def test_login_keeps_valid_token(self):
+        response = self.client.post('/login', {'username': 'gamer', 'password': 'password'})
+        self.assertEqual(response.json()['token'], self.token.key)
+
+    def test_login_replaces_expired_token(self):
+        self.expire(self.token)
+        response = self.client.post('/login', {'username': 'gamer', 'password': 'password'})
+        new_key = response.json()['token']
+        self.assertNotEqual(new_key, self.token.key)
+        self.assertEqual(self.get(new_key).status_code, 200)
+
+    def test_login_without_token(self):
+        self.token.delete()
+        response = self.client.post('/login', {'username': 'gamer', 'password': 'password'})
+        self.assertEqual(self.get(response.json()['token']).status_code, 200)
+
+    def test_purge_expired_tokens(self):
+        expired_users = [User.objects.create(username=f'old{i}') for i in range(3)]
+        for user in expired_users:
+            self.expire(Token.objects.create(user=user))
+        out = StringIO()
+        with mock.patch('levelupapi.management.commands.purge_expired_tokens.BATCH_SIZE', 2):
+            call_command('purge_expired_tokens', stdout=out)
+        self.assertIn('Purged 3 expired tokens', out.getvalue())
+        self.assertEqual(list(Token.objects.values_list('key', flat=True)), [self.token.key])
+
+
+@override_settings(IDEMPOTENT_PATHS=[r'^/events$'], IDEMPOTENCY_WAIT_SECONDS=5)
+class IdempotencyMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def view(self, request):
+        self.calls += 1
+        response = HttpResponse(b'{"id": %d}' % self.calls, status=201,
+                                content_type='application/json')
+        response['Location'] = f'/events/{self.calls}'
+        response['Vary'] = 'Accept'
+        return response
+
+    def post(self, middleware, path='/events', body=b'{}', key='abc'):
+        extra = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        request = RequestFactory().post(path, data=body, content_type='application/json', **extra)
+        return middleware(request)
+
+    def test_replay_returns_stored_response(self):
+        middleware = idempotency.IdempotencyMiddleware(self.view)
+        first = self.post(middleware)
+        second = self.post(middleware)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Content-Type'], 'application/json')
+        self.assertEqual(second['Location'], '/events/1')
+        self.assertEqual(second['Vary'], 'Accept')
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertFalse(first.has_header('Idempotent-Replayed'))
+
+    def test_different_body_is_rejected(self):
+        middleware = idempotency.IdempotencyMiddleware(self.view)
+        self.post(middleware)
+        response = self.post(middleware, body=b'{"other": 1}')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.calls, 1)
+
+    def test_different_keys_run_the_view(self):
+        middleware = idempotency.IdempotencyMiddleware(self.view)
+        self.post(middleware, key='one')
+        self.post(middleware, key='two')
+        self.assertEqual(self.calls, 2)
+
+    def test_without_key_the_view_always_runs(self):
+        middleware = idempotency.IdempotencyMiddleware(self.view)
+        self.post(middleware, key=None)
+        self.post(middleware, key=None)
+        self.assertEqual(self.calls, 2)
+
+    def test_unlisted_paths_are_not_stored(self):
+        middleware = idempotency.IdempotencyMiddleware(self.view)
+        self.post(middleware, path='/login')
+        self.post(middleware, path='/login')
+        self.assertEqual(self.calls, 2)
+
+    def test_overlong_key_is_rejected(self):
+        middleware = idempotency.IdempotencyMiddleware(self.view)
+        self.assertEqual(self.post(middleware, key='x' * 256).status_code, 400)
+        self.assertEqual(self.calls, 0)
+
+    def test_server_error_releases_key(self):
+        statuses = iter([500, 201])
+
+        def view(request):
+            self.calls += 1
+            return HttpResponse(status=next(statuses))
+
+        middleware = idempotency.IdempotencyMiddleware(view)
+        self.assertEqual(self.post(middleware).status_code, 500)
+        self.assertEqual(self.post(middleware).status_code, 201)
+        self.assertEqual(self.calls, 2)
+
+    def test_exception_releases_key(self):
+        def view(request):
+            self.calls += 1
+            if self.calls == 1:
+                raise RuntimeError
+            return HttpResponse(status=201)
+
+        middleware = idempotency.IdempotencyMiddleware(view)
+        with self.assertRaises(RuntimeError):
+            self.post(middleware)
+        self.assertEqual(self.post(middleware).status_code, 201)
+
+    def start_blocked_request(self, middleware):
+        """Run a first request in a thread and hold it inside the view"""
+        entered, release = threading.Event(), threading.Event()
+        real_view = middleware.get_response
+
+        def blocking_view(request):
+            entered.set()
+            release.wait(5)
+            return real_view(request)
+
+        middleware.get_response = blocking_view
+        results = []
+        thread = threading.Thread(target=lambda: results.append(self.post(middleware)))
+        thread.start()
+        entered.wait(5)
+        return release, thread, results
+
+    def test_concurrent_duplicate_waits_for_first_request(self):
+        middleware = idempotency.IdempotencyMiddleware(self.view)
+        release, thread, results = self.start_blocked_request(middleware)
+        threading.Timer(0.1, release.set).start()
+        replay = self.post(middleware)
+        thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results[0].status_code, 201)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.content, results[0].content)
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0.05)
+    def test_concurrent_duplicate_gives_up_after_waiting(self):
+        middleware = idempotency.IdempotencyMiddleware(self.view)
+        release, thread, _ = self.start_blocked_request(middleware)
+        try:
+            self.assertEqual(self.post(middleware).status_code, 409)
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(self.calls, 1)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class IdempotentRegisterTests(TransactionTestCase):
+
+    registration = {
+        'username': 'newgamer', 'password': 'password',
+        'first_name': 'New', 'last_name': 'Gamer', 'bio': 'Bio',
+    }
+
+    def setUp(self):
+        cache.clear()
+
+    def register(self, client=None):
+        return (client or self.client).post(
+            '/register', self.registration, content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY='signup-1')
+
+    def test_retried_register_creates_one_user(self):
+        first = self.register()
+        second = self.register()
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(User.objects.filter(username='newgamer').count(), 1)
+
+    def test_concurrent_register_creates_one_user(self):
+        responses = []
+        threads = [
+            threading.Thread(target=lambda: responses.append(self.register(self.client_class())))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([response.status_code for response in responses], [200] * 4)
+        self.assertEqual(len({response.content for response in responses}), 1)
+        self.assertEqual(User.objects.filter(username='newgamer').count(), 1)
+
+    def test_replayed_register_gets_current_token(self):
+        first = self.register().json()['token']
+        rotated = self.client.post(
+            '/token/rotate', HTTP_AUTHORIZATION=f'Token {first}').json()['token']
+        replay = self.register()
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.json(), {'token': rotated})
+        games = self.client.get('/games', HTTP_AUTHORIZATION=f'Token {rotated}')
+        self.assertEqual(games.status_code, 200)
+
+    def test_token_is_not_stored(self):
+        token = self.register().json()['token']
+        # pylint: disable=protected-access
+        stored = [pickle.loads(value) for value in cache._cache.values()]
+        self.assertNotIn(token, repr(stored))
+
+    def test_login_is_not_stored(self):
+        self.register()
+        login = {'username': 'newgamer', 'password': 'password'}
+        for _ in range(2):
+            response = self.client.post('/login', login, HTTP_IDEMPOTENCY_KEY='login-1')
+            self.assertFalse(response.has_header('Idempotent-Replayed'))
@@ -1,4 +1,4 @@
-from .auth import login_user, register_user
+from .auth import login_user, register_user, rotate_token
 from .game_type import GameTypeView, GameTypeSerializer
 from .event import EventView, EventSerializer
-from .game import GameView, GameSerializer
\ No newline at end of file
+from .game import GameView, GameSerializer
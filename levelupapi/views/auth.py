@@ -1,10 +1,12 @@
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
+from levelupapi.authentication import token_expired
 from levelupapi.models import Gamer
 
 @api_view(['POST'])
@@ -24,7 +26,7 @@ def login_user(request):
 
     # If authentication was successful, respond with their token
     if authenticated_user is not None:
-        token = Token.objects.get(user=authenticated_user)
+        token = issue_token(authenticated_user.pk)
         data = {
             'valid': True,
             'token': token.key
@@ -64,3 +66,45 @@ def register_user(request):
     # Return the token to the client
     data = { 'token': token.key }
     return Response(data)
+
+@api_view(['POST'])
+def rotate_token(request):
+    '''Swaps the caller's token for a new one
+
+    The old token stops working straight away on every worker.
+
+    Method arguments:
+      request -- The full HTTP request object
+    '''
+    token = _replace_token(request.auth)
+    data = { 'token': token.key }
+    return Response(data)
+
+def issue_token(user_id):
+    '''The user's current token, creating one if they have none
+
+    Tokens expire, so an expired one is replaced rather than handed out.
+    '''
+    token, _ = Token.objects.get_or_create(user_id=user_id)
+    if token_expired(token):
+        token = _replace_token(token)
+    return token
+
+def _replace_token(token):
+    '''Deletes the given token and issues its user a new one'''
+    user = token.user
+    with transaction.atomic():
+        # Lock the row so concurrent rotations of the same token queue up
+        # instead of both deleting it and racing to create the replacement
+        current = Token.objects.select_for_update().filter(pk=token.pk).first()
+        if current is None:
+            # Another request already replaced it
+            return Token.objects.get(user=user)
+        # Deleting the old token revokes it from every worker's token cache
+        current.delete()
+        try:
+            with transaction.atomic():
+                return Token.objects.create(user=user)
+        except IntegrityError:
+            # Databases without row locks (SQLite) can still get here
+            return Token.objects.get(user=user)
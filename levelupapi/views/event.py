@@ -1,12 +1,9 @@
 """View module for handling requests about game types"""
-from django.http import HttpResponseServerError
-from django.core.exceptions import ValidationError
 from rest_framework.decorators import action
 from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
 from rest_framework import serializers, status
 from levelupapi.models import Event
-from levelupapi.models import gamer
 from levelupapi.models.game import Game
 from levelupapi.models.gamer import Gamer
 
@@ -1,6 +1,4 @@
 """View module for handling requests about game types"""
-from django.http import HttpResponseServerError
-from django.core.exceptions import ValidationError
 from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
 from rest_framework import serializers, status